@@ -1,7 +1,9 @@
 # async_queue.py
 
+from collections import deque
 from dataclasses import dataclass, field
 from typing import Optional, List
+import asyncio
 import asyncpg
 import os
 import logging
@@ -12,6 +14,10 @@ from orjson import dumps, loads
 from tembo_pgmq_python.messages import Message, QueueMetrics
 from tembo_pgmq_python.decorators import async_transaction as transaction
 
+# (host, port, database) targets where the pgmq extension is known to be installed, so that
+# further clients for the same database skip the check in init().
+_initialized_databases = set()
+
 
 @dataclass
 class PGMQueue:
@@ -28,8 +34,11 @@ class PGMQueue:
     perform_transaction: bool = False
     verbose: bool = False
     log_filename: Optional[str] = None
+    kwargs: dict = field(default_factory=dict)
+    prefetch_size: int = 1
     pool: asyncpg.pool.Pool = field(init=False)
     logger: logging.Logger = field(init=False)
+    _prefetched: dict = field(init=False, repr=False, default_factory=dict)
 
     def __post_init__(self) -> None:
         self.host = self.host or "localhost"
@@ -59,18 +68,24 @@ class PGMQueue:
 
     async def init(self):
         self.logger.debug("Creating asyncpg connection pool")
+        pool_kwargs = {"min_size": 1, **self.kwargs}
+        # pool_size must not undercut a min_size passed through kwargs.
+        pool_kwargs.setdefault("max_size", max(self.pool_size, pool_kwargs["min_size"]))
         self.pool = await asyncpg.create_pool(
             user=self.username,
             database=self.database,
             password=self.password,
             host=self.host,
             port=self.port,
-            min_size=1,
-            max_size=self.pool_size,
+            **pool_kwargs,
         )
+        database = (self.host, self.port, self.database)
+        if database in _initialized_databases:
+            return
         self.logger.debug("Initializing pgmq extension")
         async with self.pool.acquire() as conn:
             await conn.execute("create extension if not exists pgmq cascade;")
+        _initialized_databases.add(database)
 
     @transaction
     async def create_partitioned_queue(
@@ -82,9 +97,11 @@ class PGMQueue:
     ) -> None:
         """Create a new partitioned queue."""
         self.logger.debug(
-            f"create_partitioned_queue called with queue='{queue}', "
-            f"partition_interval={partition_interval}, "
-            f"retention_interval={retention_interval}, conn={conn}"
+            "create_partitioned_queue called with queue='%s', partition_interval=%s, retention_interval=%s, conn=%s",
+            queue,
+            partition_interval,
+            retention_interval,
+            conn,
         )
         if conn is None:
             async with self.pool.acquire() as conn:
@@ -93,7 +110,7 @@ class PGMQueue:
             await self._create_partitioned_queue_internal(queue, partition_interval, retention_interval, conn)
 
     async def _create_partitioned_queue_internal(self, queue, partition_interval, retention_interval, conn):
-        self.logger.debug(f"Creating partitioned queue '{queue}'")
+        self.logger.debug("Creating partitioned queue '%s'", queue)
         await conn.execute(
             "SELECT pgmq.create($1, $2::text, $3::text);",
             queue,
@@ -104,7 +121,7 @@ class PGMQueue:
     @transaction
     async def create_queue(self, queue: str, unlogged: bool = False, conn=None) -> None:
         """Create a new queue."""
-        self.logger.debug(f"create_queue called with queue='{queue}', unlogged={unlogged}, conn={conn}")
+        self.logger.debug("create_queue called with queue='%s', unlogged=%s, conn=%s", queue, unlogged, conn)
         if conn is None:
             async with self.pool.acquire() as conn:
                 await self._create_queue_internal(queue, unlogged, conn)
@@ -112,7 +129,7 @@ class PGMQueue:
             await self._create_queue_internal(queue, unlogged, conn)
 
     async def _create_queue_internal(self, queue, unlogged, conn):
-        self.logger.debug(f"Creating queue '{queue}' with unlogged={unlogged}")
+        self.logger.debug("Creating queue '%s' with unlogged=%s", queue, unlogged)
         if unlogged:
             await conn.execute("SELECT pgmq.create_unlogged($1);", queue)
         else:
@@ -120,14 +137,14 @@ class PGMQueue:
 
     async def validate_queue_name(self, queue_name: str) -> None:
         """Validate the length of a queue name."""
-        self.logger.debug(f"validate_queue_name called with queue_name='{queue_name}'")
+        self.logger.debug("validate_queue_name called with queue_name='%s'", queue_name)
         async with self.pool.acquire() as conn:
             await conn.execute("SELECT pgmq.validate_queue_name($1);", queue_name)
 
     @transaction
     async def drop_queue(self, queue: str, partitioned: bool = False, conn=None) -> bool:
         """Drop a queue."""
-        self.logger.debug(f"drop_queue called with queue='{queue}', partitioned={partitioned}, conn={conn}")
+        self.logger.debug("drop_queue called with queue='%s', partitioned=%s, conn=%s", queue, partitioned, conn)
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._drop_queue_internal(queue, partitioned, conn)
@@ -135,14 +152,13 @@ class PGMQueue:
             return await self._drop_queue_internal(queue, partitioned, conn)
 
     async def _drop_queue_internal(self, queue, partitioned, conn):
-        result = await conn.fetchrow("SELECT pgmq.drop_queue($1, $2);", queue, partitioned)
-        self.logger.debug(f"Queue '{queue}' dropped: {result[0]}")
-        return result[0]
+        dropped = await conn.fetchval("SELECT pgmq.drop_queue($1, $2);", queue, partitioned)
+        self.logger.debug("Queue '%s' dropped: %s", queue, dropped)
+        return dropped
 
-    @transaction
     async def list_queues(self, conn=None) -> List[str]:
         """List all queues."""
-        self.logger.debug(f"list_queues called with conn={conn}")
+        self.logger.debug("list_queues called with conn=%s", conn)
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._list_queues_internal(conn)
@@ -151,14 +167,15 @@ class PGMQueue:
 
     async def _list_queues_internal(self, conn):
         rows = await conn.fetch("SELECT queue_name FROM pgmq.list_queues();")
-        queues = [row["queue_name"] for row in rows]
-        self.logger.debug(f"Queues listed: {queues}")
+        queues = [row[0] for row in rows]
+        self.logger.debug("Queues listed: %s", queues)
         return queues
 
-    @transaction
     async def send(self, queue: str, message: dict, delay: int = 0, tz: datetime = None, conn=None) -> int:
         """Send a message to a queue."""
-        self.logger.debug(f"send called with queue='{queue}', message={message}, delay={delay}, tz={tz}, conn={conn}")
+        self.logger.debug(
+            "send called with queue='%s', message=%s, delay=%s, tz=%s, conn=%s", queue, message, delay, tz, conn
+        )
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._send_internal(queue, message, delay, tz, conn)
@@ -173,43 +190,41 @@ class PGMQueue:
         tz: datetime = None,
         conn=None,
     ):
-        self.logger.debug(f"Sending message to queue '{queue}' with delay={delay}, tz={tz}")
-        result = None
+        self.logger.debug("Sending message to queue '%s' with delay=%s, tz=%s", queue, delay, tz)
         if delay:
-            result = await conn.fetchrow(
+            msg_id = await conn.fetchval(
                 "SELECT * FROM pgmq.send($1::text, $2::jsonb, $3::integer);",
                 queue,
                 dumps(message).decode("utf-8"),
                 delay,
             )
         elif tz:
-            result = await conn.fetchrow(
+            msg_id = await conn.fetchval(
                 "SELECT * FROM pgmq.send($1::text, $2::jsonb, $3::timestamptz);",
                 queue,
                 dumps(message).decode("utf-8"),
                 tz,
             )
         else:
-            result = await conn.fetchrow(
+            msg_id = await conn.fetchval(
                 "SELECT * FROM pgmq.send($1::text, $2::jsonb);",
                 queue,
                 dumps(message).decode("utf-8"),
             )
-        self.logger.debug(f"Message sent with msg_id={result[0]}")
-        return result[0]
+        self.logger.debug("Message sent with msg_id=%s", msg_id)
+        return msg_id
 
-    @transaction
     async def send_batch(
         self,
         queue: str,
         messages: List[dict],
         delay: int = 0,
-        tz: str = None,
+        tz: datetime = None,
         conn=None,
     ) -> List[int]:
         """Send a batch of messages to a queue."""
         self.logger.debug(
-            f"send_batch called with queue='{queue}', messages={messages}, delay={delay}, tz={tz}, conn={conn}"
+            "send_batch called with queue='%s', messages=%s, delay=%s, tz=%s, conn=%s", queue, messages, delay, tz, conn
         )
         if conn is None:
             async with self.pool.acquire() as conn:
@@ -225,7 +240,7 @@ class PGMQueue:
         tz: datetime = None,
         conn=None,
     ):
-        self.logger.debug(f"Sending batch of messages to queue '{queue}' with delay={delay}, tz={tz}")
+        self.logger.debug("Sending batch of messages to queue '%s' with delay=%s, tz=%s", queue, delay, tz)
         jsonb_array = [dumps(message).decode("utf-8") for message in messages]
         result = None
         if delay:
@@ -237,7 +252,7 @@ class PGMQueue:
             )
         elif tz:
             result = await conn.fetch(
-                "SELECT * FROM pgmq.send_batch($1, $2::jsonb[], $3::integer);",
+                "SELECT * FROM pgmq.send_batch($1, $2::jsonb[], $3::timestamptz);",
                 queue,
                 jsonb_array,
                 tz,
@@ -249,13 +264,12 @@ class PGMQueue:
                 jsonb_array,
             )
         msg_ids = [message[0] for message in result]
-        self.logger.debug(f"Batch messages sent with msg_ids={msg_ids}")
+        self.logger.debug("Batch messages sent with msg_ids=%s", msg_ids)
         return msg_ids
 
-    @transaction
     async def read(self, queue: str, vt: Optional[int] = None, conn=None) -> Optional[Message]:
         """Read a message from a queue."""
-        self.logger.debug(f"read called with queue='{queue}', vt={vt}, conn={conn}")
+        self.logger.debug("read called with queue='%s', vt=%s, conn=%s", queue, vt, conn)
         batch_size = 1
         if conn is None:
             async with self.pool.acquire() as conn:
@@ -264,32 +278,29 @@ class PGMQueue:
             return await self._read_internal(queue, vt, batch_size, conn)
 
     async def _read_internal(self, queue, vt, batch_size, conn):
-        self.logger.debug(f"Reading message from queue '{queue}' with vt={vt}")
-        rows = await conn.fetch(
+        self.logger.debug("Reading message from queue '%s' with vt=%s", queue, vt)
+        row = await conn.fetchrow(
             "SELECT * FROM pgmq.read($1::text, $2::integer, $3::integer);",
             queue,
             vt or self.vt,
             batch_size,
         )
-        messages = [
-            Message(
-                msg_id=row[0],
-                read_ct=row[1],
-                enqueued_at=row[2],
-                vt=row[3],
-                message=loads(row[4]),
-            )
-            for row in rows
-        ]
-        self.logger.debug(f"Message read: {messages[0] if messages else None}")
-        return messages[0] if messages else None
+        message = Message(row[0], row[1], row[2], row[3], loads(row[4])) if row else None
+        self.logger.debug("Message read: %s", message)
+        return message
+
+    async def read_many(self, queues: List[str], vt: Optional[int] = None) -> List[Optional[Message]]:
+        """Read a message from each of several queues concurrently."""
+        self.logger.debug("read_many called with queues=%s, vt=%s", queues, vt)
+        return list(await asyncio.gather(*(self.read(queue, vt) for queue in queues)))
 
-    @transaction
     async def read_batch(
         self, queue: str, vt: Optional[int] = None, batch_size=1, conn=None
     ) -> Optional[List[Message]]:
         """Read a batch of messages from a queue."""
-        self.logger.debug(f"read_batch called with queue='{queue}', vt={vt}, batch_size={batch_size}, conn={conn}")
+        self.logger.debug(
+            "read_batch called with queue='%s', vt=%s, batch_size=%s, conn=%s", queue, vt, batch_size, conn
+        )
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._read_batch_internal(queue, vt, batch_size, conn)
@@ -297,27 +308,17 @@ class PGMQueue:
             return await self._read_batch_internal(queue, vt, batch_size, conn)
 
     async def _read_batch_internal(self, queue, vt, batch_size, conn):
-        self.logger.debug(f"Reading batch of messages from queue '{queue}' with vt={vt}")
+        self.logger.debug("Reading batch of messages from queue '%s' with vt=%s", queue, vt)
         rows = await conn.fetch(
             "SELECT * FROM pgmq.read($1::text, $2::integer, $3::integer);",
             queue,
             vt or self.vt,
             batch_size,
         )
-        messages = [
-            Message(
-                msg_id=row[0],
-                read_ct=row[1],
-                enqueued_at=row[2],
-                vt=row[3],
-                message=loads(row[4]),
-            )
-            for row in rows
-        ]
-        self.logger.debug(f"Batch messages read: {messages}")
+        messages = [Message(row[0], row[1], row[2], row[3], loads(row[4])) for row in rows]
+        self.logger.debug("Batch messages read: %s", messages)
         return messages
 
-    @transaction
     async def read_with_poll(
         self,
         queue: str,
@@ -329,8 +330,13 @@ class PGMQueue:
     ) -> Optional[List[Message]]:
         """Read messages from a queue with polling."""
         self.logger.debug(
-            f"read_with_poll called with queue='{queue}', vt={vt}, qty={qty}, "
-            f"max_poll_seconds={max_poll_seconds}, poll_interval_ms={poll_interval_ms}, conn={conn}"
+            "read_with_poll called with queue='%s', vt=%s, qty=%s, max_poll_seconds=%s, poll_interval_ms=%s, conn=%s",
+            queue,
+            vt,
+            qty,
+            max_poll_seconds,
+            poll_interval_ms,
+            conn,
         )
         if conn is None:
             async with self.pool.acquire() as conn:
@@ -339,7 +345,7 @@ class PGMQueue:
             return await self._read_with_poll_internal(queue, vt, qty, max_poll_seconds, poll_interval_ms, conn)
 
     async def _read_with_poll_internal(self, queue, vt, qty, max_poll_seconds, poll_interval_ms, conn):
-        self.logger.debug(f"Reading messages with polling from queue '{queue}'")
+        self.logger.debug("Reading messages with polling from queue '%s'", queue)
         rows = await conn.fetch(
             "SELECT * FROM pgmq.read_with_poll($1, $2, $3, $4, $5);",
             queue,
@@ -348,23 +354,49 @@ class PGMQueue:
             max_poll_seconds,
             poll_interval_ms,
         )
-        messages = [
-            Message(
-                msg_id=row[0],
-                read_ct=row[1],
-                enqueued_at=row[2],
-                vt=row[3],
-                message=loads(row[4]),
-            )
-            for row in rows
-        ]
-        self.logger.debug(f"Messages read with polling: {messages}")
+        messages = [Message(row[0], row[1], row[2], row[3], loads(row[4])) for row in rows]
+        self.logger.debug("Messages read with polling: %s", messages)
+        return messages
+
+    async def read_with_backoff(
+        self, queue: str, qty: int = 1, base: int = 2, cap: int = 32, conn=None
+    ) -> List[Message]:
+        """Read messages from a queue, hiding each for min(base ** read_ct, cap) seconds."""
+        self.logger.debug(
+            "read_with_backoff called with queue='%s', qty=%s, base=%s, cap=%s, conn=%s", queue, qty, base, cap, conn
+        )
+        if conn is None:
+            async with self.pool.acquire() as conn:
+                return await self._read_with_backoff_internal(queue, qty, base, cap, conn)
+        else:
+            return await self._read_with_backoff_internal(queue, qty, base, cap, conn)
+
+    async def _read_with_backoff_internal(self, queue, qty, base, cap, conn):
+        self.logger.debug("Reading messages with backoff from queue '%s'", queue)
+        # The exponent is capped at 31: any integer base >= 2 already reaches every integer cap by then,
+        # and power() would overflow float8 for large read_ct, failing the read on every retry.
+        rows = await conn.fetch(
+            """
+            SELECT s.* FROM pgmq.read($1::text, $2::integer, $3::integer) r,
+            LATERAL pgmq.set_vt(
+                $1::text, r.msg_id, LEAST(power($4::integer, LEAST(r.read_ct, 31)), $2::integer)::integer
+            ) s
+            ORDER BY s.msg_id;
+            """,
+            queue,
+            cap,
+            qty,
+            base,
+        )
+        messages = [Message(row[0], row[1], row[2], row[3], loads(row[4])) for row in rows]
+        self.logger.debug("Messages read with backoff: %s", messages)
         return messages
 
-    @transaction
     async def pop(self, queue: str, conn=None) -> Message:
         """Pop a message from a queue."""
-        self.logger.debug(f"pop called with queue='{queue}', conn={conn}")
+        self.logger.debug("pop called with queue='%s', conn=%s", queue, conn)
+        if self.prefetch_size > 1 and conn is None:
+            return await self._pop_prefetched(queue)
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._pop_internal(queue, conn)
@@ -372,25 +404,52 @@ class PGMQueue:
             return await self._pop_internal(queue, conn)
 
     async def _pop_internal(self, queue, conn):
-        self.logger.debug(f"Popping message from queue '{queue}'")
-        rows = await conn.fetch("SELECT * FROM pgmq.pop($1);", queue)
-        messages = [
-            Message(
-                msg_id=row[0],
-                read_ct=row[1],
-                enqueued_at=row[2],
-                vt=row[3],
-                message=loads(row[4]),
-            )
-            for row in rows
-        ]
-        self.logger.debug(f"Message popped: {messages[0] if messages else None}")
-        return messages[0] if messages else None
+        self.logger.debug("Popping message from queue '%s'", queue)
+        row = await conn.fetchrow("SELECT * FROM pgmq.pop($1);", queue)
+        message = Message(row[0], row[1], row[2], row[3], loads(row[4])) if row else None
+        self.logger.debug("Message popped: %s", message)
+        return message
+
+    async def _pop_prefetched(self, queue):
+        # Messages are deleted from the queue when they are prefetched, so serving them
+        # from the local buffer keeps pop's at-most-once delivery.
+        buffer = self._prefetched.setdefault(queue, deque())
+        if not buffer:
+            buffer.extend(await self.pop_batch(queue, self.prefetch_size))
+        try:
+            return buffer.popleft()
+        except IndexError:
+            return None
+
+    async def pop_batch(self, queue: str, qty: int = 1, conn=None) -> List[Message]:
+        """Pop up to qty messages from a queue in a single round-trip."""
+        self.logger.debug("pop_batch called with queue='%s', qty=%s, conn=%s", queue, qty, conn)
+        if conn is None:
+            async with self.pool.acquire() as conn:
+                return await self._pop_batch_internal(queue, qty, conn)
+        else:
+            return await self._pop_batch_internal(queue, qty, conn)
+
+    async def _pop_batch_internal(self, queue, qty, conn):
+        self.logger.debug("Popping up to %s messages from queue '%s'", qty, queue)
+        # pgmq.read increments read_ct and sets vt to now; undo the former so read_ct matches what pop reports.
+        rows = await conn.fetch(
+            """
+            WITH r AS (SELECT * FROM pgmq.read($1::text, 0, $2::integer))
+            SELECT r.msg_id, r.read_ct - 1, r.enqueued_at, r.vt, r.message FROM r
+            WHERE r.msg_id IN (SELECT pgmq.delete($1::text, ARRAY(SELECT msg_id FROM r)))
+            ORDER BY r.msg_id;
+            """,
+            queue,
+            qty,
+        )
+        messages = [Message(row[0], row[1], row[2], row[3], loads(row[4])) for row in rows]
+        self.logger.debug("Messages popped: %s", messages)
+        return messages
 
-    @transaction
     async def delete(self, queue: str, msg_id: int, conn=None) -> bool:
         """Delete a message from a queue."""
-        self.logger.debug(f"delete called with queue='{queue}', msg_id={msg_id}, conn={conn}")
+        self.logger.debug("delete called with queue='%s', msg_id=%s, conn=%s", queue, msg_id, conn)
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._delete_internal(queue, msg_id, conn)
@@ -398,15 +457,14 @@ class PGMQueue:
             return await self._delete_internal(queue, msg_id, conn)
 
     async def _delete_internal(self, queue, msg_id, conn):
-        self.logger.debug(f"Deleting message with msg_id={msg_id} from queue '{queue}'")
-        row = await conn.fetchrow("SELECT pgmq.delete($1::text, $2::int);", queue, msg_id)
-        self.logger.debug(f"Message deleted: {row[0]}")
-        return row[0]
+        self.logger.debug("Deleting message with msg_id=%s from queue '%s'", msg_id, queue)
+        deleted = await conn.fetchval("SELECT pgmq.delete($1::text, $2::bigint);", queue, msg_id)
+        self.logger.debug("Message deleted: %s", deleted)
+        return deleted
 
-    @transaction
     async def delete_batch(self, queue: str, msg_ids: List[int], conn=None) -> List[int]:
         """Delete multiple messages from a queue."""
-        self.logger.debug(f"delete_batch called with queue='{queue}', msg_ids={msg_ids}, conn={conn}")
+        self.logger.debug("delete_batch called with queue='%s', msg_ids=%s, conn=%s", queue, msg_ids, conn)
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._delete_batch_internal(queue, msg_ids, conn)
@@ -414,16 +472,15 @@ class PGMQueue:
             return await self._delete_batch_internal(queue, msg_ids, conn)
 
     async def _delete_batch_internal(self, queue, msg_ids, conn):
-        self.logger.debug(f"Deleting messages with msg_ids={msg_ids} from queue '{queue}'")
-        results = await conn.fetch("SELECT * FROM pgmq.delete($1::text, $2::int[]);", queue, msg_ids)
+        self.logger.debug("Deleting messages with msg_ids=%s from queue '%s'", msg_ids, queue)
+        results = await conn.fetch("SELECT * FROM pgmq.delete($1::text, $2::bigint[]);", queue, msg_ids)
         deleted_ids = [result[0] for result in results]
-        self.logger.debug(f"Messages deleted: {deleted_ids}")
+        self.logger.debug("Messages deleted: %s", deleted_ids)
         return deleted_ids
 
-    @transaction
     async def archive(self, queue: str, msg_id: int, conn=None) -> bool:
         """Archive a message from a queue."""
-        self.logger.debug(f"archive called with queue='{queue}', msg_id={msg_id}, conn={conn}")
+        self.logger.debug("archive called with queue='%s', msg_id=%s, conn=%s", queue, msg_id, conn)
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._archive_internal(queue, msg_id, conn)
@@ -431,15 +488,14 @@ class PGMQueue:
             return await self._archive_internal(queue, msg_id, conn)
 
     async def _archive_internal(self, queue, msg_id, conn):
-        self.logger.debug(f"Archiving message with msg_id={msg_id} from queue '{queue}'")
-        row = await conn.fetchrow("SELECT pgmq.archive($1::text, $2::int);", queue, msg_id)
-        self.logger.debug(f"Message archived: {row[0]}")
-        return row[0]
+        self.logger.debug("Archiving message with msg_id=%s from queue '%s'", msg_id, queue)
+        archived = await conn.fetchval("SELECT pgmq.archive($1::text, $2::bigint);", queue, msg_id)
+        self.logger.debug("Message archived: %s", archived)
+        return archived
 
-    @transaction
     async def archive_batch(self, queue: str, msg_ids: List[int], conn=None) -> List[int]:
         """Archive multiple messages from a queue."""
-        self.logger.debug(f"archive_batch called with queue='{queue}', msg_ids={msg_ids}, conn={conn}")
+        self.logger.debug("archive_batch called with queue='%s', msg_ids=%s, conn=%s", queue, msg_ids, conn)
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._archive_batch_internal(queue, msg_ids, conn)
@@ -447,16 +503,15 @@ class PGMQueue:
             return await self._archive_batch_internal(queue, msg_ids, conn)
 
     async def _archive_batch_internal(self, queue, msg_ids, conn):
-        self.logger.debug(f"Archiving messages with msg_ids={msg_ids} from queue '{queue}'")
-        results = await conn.fetch("SELECT * FROM pgmq.archive($1::text, $2::int[]);", queue, msg_ids)
+        self.logger.debug("Archiving messages with msg_ids=%s from queue '%s'", msg_ids, queue)
+        results = await conn.fetch("SELECT * FROM pgmq.archive($1::text, $2::bigint[]);", queue, msg_ids)
         archived_ids = [result[0] for result in results]
-        self.logger.debug(f"Messages archived: {archived_ids}")
+        self.logger.debug("Messages archived: %s", archived_ids)
         return archived_ids
 
-    @transaction
     async def purge(self, queue: str, conn=None) -> int:
         """Purge a queue."""
-        self.logger.debug(f"purge called with queue='{queue}', conn={conn}")
+        self.logger.debug("purge called with queue='%s', conn=%s", queue, conn)
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._purge_internal(queue, conn)
@@ -464,15 +519,14 @@ class PGMQueue:
             return await self._purge_internal(queue, conn)
 
     async def _purge_internal(self, queue, conn):
-        self.logger.debug(f"Purging queue '{queue}'")
-        row = await conn.fetchrow("SELECT pgmq.purge_queue($1);", queue)
-        self.logger.debug(f"Messages purged: {row[0]}")
-        return row[0]
+        self.logger.debug("Purging queue '%s'", queue)
+        purged = await conn.fetchval("SELECT pgmq.purge_queue($1);", queue)
+        self.logger.debug("Messages purged: %s", purged)
+        return purged
 
-    @transaction
     async def metrics(self, queue: str, conn=None) -> QueueMetrics:
         """Get metrics for a specific queue."""
-        self.logger.debug(f"metrics called with queue='{queue}', conn={conn}")
+        self.logger.debug("metrics called with queue='%s', conn=%s", queue, conn)
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._metrics_internal(queue, conn)
@@ -480,23 +534,15 @@ class PGMQueue:
             return await self._metrics_internal(queue, conn)
 
     async def _metrics_internal(self, queue, conn):
-        self.logger.debug(f"Fetching metrics for queue '{queue}'")
+        self.logger.debug("Fetching metrics for queue '%s'", queue)
         result = await conn.fetchrow("SELECT * FROM pgmq.metrics($1);", queue)
-        metrics = QueueMetrics(
-            queue_name=result[0],
-            queue_length=result[1],
-            newest_msg_age_sec=result[2],
-            oldest_msg_age_sec=result[3],
-            total_messages=result[4],
-            scrape_time=result[5],
-        )
-        self.logger.debug(f"Metrics fetched: {metrics}")
+        metrics = QueueMetrics(result[0], result[1], result[2], result[3], result[4], result[5])
+        self.logger.debug("Metrics fetched: %s", metrics)
         return metrics
 
-    @transaction
     async def metrics_all(self, conn=None) -> List[QueueMetrics]:
         """Get metrics for all queues."""
-        self.logger.debug(f"metrics_all called with conn={conn}")
+        self.logger.debug("metrics_all called with conn=%s", conn)
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._metrics_all_internal(conn)
@@ -506,24 +552,13 @@ class PGMQueue:
     async def _metrics_all_internal(self, conn):
         self.logger.debug("Fetching metrics for all queues")
         results = await conn.fetch("SELECT * FROM pgmq.metrics_all();")
-        metrics_list = [
-            QueueMetrics(
-                queue_name=row[0],
-                queue_length=row[1],
-                newest_msg_age_sec=row[2],
-                oldest_msg_age_sec=row[3],
-                total_messages=row[4],
-                scrape_time=row[5],
-            )
-            for row in results
-        ]
-        self.logger.debug(f"All metrics fetched: {metrics_list}")
+        metrics_list = [QueueMetrics(row[0], row[1], row[2], row[3], row[4], row[5]) for row in results]
+        self.logger.debug("All metrics fetched: %s", metrics_list)
         return metrics_list
 
-    @transaction
     async def set_vt(self, queue: str, msg_id: int, vt: int, conn=None) -> Message:
         """Set the visibility timeout for a specific message."""
-        self.logger.debug(f"set_vt called with queue='{queue}', msg_id={msg_id}, vt={vt}, conn={conn}")
+        self.logger.debug("set_vt called with queue='%s', msg_id=%s, vt=%s, conn=%s", queue, msg_id, vt, conn)
         if conn is None:
             async with self.pool.acquire() as conn:
                 return await self._set_vt_internal(queue, msg_id, vt, conn)
@@ -531,22 +566,16 @@ class PGMQueue:
             return await self._set_vt_internal(queue, msg_id, vt, conn)
 
     async def _set_vt_internal(self, queue, msg_id, vt, conn):
-        self.logger.debug(f"Setting VT for msg_id={msg_id} in queue '{queue}' to vt={vt}")
+        self.logger.debug("Setting VT for msg_id=%s in queue '%s' to vt=%s", msg_id, queue, vt)
         row = await conn.fetchrow("SELECT * FROM pgmq.set_vt($1, $2, $3);", queue, msg_id, vt)
-        message = Message(
-            msg_id=row[0],
-            read_ct=row[1],
-            enqueued_at=row[2],
-            vt=row[3],
-            message=loads(row[4]),
-        )
-        self.logger.debug(f"VT set for message: {message}")
+        message = Message(row[0], row[1], row[2], row[3], loads(row[4]))
+        self.logger.debug("VT set for message: %s", message)
         return message
 
     @transaction
     async def detach_archive(self, queue: str, conn=None) -> None:
         """Detach an archive from a queue."""
-        self.logger.debug(f"detach_archive called with queue='{queue}', conn={conn}")
+        self.logger.debug("detach_archive called with queue='%s', conn=%s", queue, conn)
         if conn is None:
             async with self.pool.acquire() as conn:
                 await self._detach_archive_internal(queue, conn)
@@ -554,6 +583,6 @@ class PGMQueue:
             await self._detach_archive_internal(queue, conn)
 
     async def _detach_archive_internal(self, queue, conn):
-        self.logger.debug(f"Detaching archive from queue '{queue}'")
+        self.logger.debug("Detaching archive from queue '%s'", queue)
         await conn.execute("SELECT pgmq.detach_archive($1);", queue)
-        self.logger.debug(f"Archive detached from queue '{queue}'")
+        self.logger.debug("Archive detached from queue '%s'", queue)
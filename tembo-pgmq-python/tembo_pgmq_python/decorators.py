@@ -13,14 +13,14 @@ def transaction(func):
             if "conn" not in kwargs:
                 with self.pool.connection() as conn:
                     with conn.transaction():
-                        self.logger.debug(f"Transaction started with conn: {conn}")
+                        self.logger.debug("Transaction started with conn: %s", conn)
                         try:
                             kwargs["conn"] = conn  # Inject 'conn' into kwargs
                             result = func(*args, **kwargs)
-                            self.logger.debug(f"Transaction completed with conn: {conn}")
+                            self.logger.debug("Transaction completed with conn: %s", conn)
                             return result
                         except Exception as e:
-                            self.logger.error(f"Transaction failed with exception: {e}, rolling back.")
+                            self.logger.error("Transaction failed with exception: %s, rolling back.", e)
                             raise
             else:
                 return func(*args, **kwargs)
@@ -31,14 +31,14 @@ def transaction(func):
             if "conn" not in kwargs:
                 with queue.pool.connection() as conn:
                     with conn.transaction():
-                        queue.logger.debug(f"Transaction started with conn: {conn}")
+                        queue.logger.debug("Transaction started with conn: %s", conn)
                         try:
                             kwargs["conn"] = conn  # Inject 'conn' into kwargs
                             result = func(*args, **kwargs)
-                            queue.logger.debug(f"Transaction completed with conn: {conn}")
+                            queue.logger.debug("Transaction completed with conn: %s", conn)
                             return result
                         except Exception as e:
-                            queue.logger.error(f"Transaction failed with exception: {e}, rolling back.")
+                            queue.logger.error("Transaction failed with exception: %s, rolling back.", e)
                             raise
             else:
                 return func(*args, **kwargs)
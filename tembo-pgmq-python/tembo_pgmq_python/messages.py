@@ -4,6 +4,8 @@ from datetime import datetime
 
 @dataclass
 class Message:
+    __slots__ = ("msg_id", "read_ct", "enqueued_at", "vt", "message")
+
     msg_id: int
     read_ct: int
     enqueued_at: datetime
@@ -13,6 +15,15 @@ class Message:
 
 @dataclass
 class QueueMetrics:
+    __slots__ = (
+        "queue_name",
+        "queue_length",
+        "newest_msg_age_sec",
+        "oldest_msg_age_sec",
+        "total_messages",
+        "scrape_time",
+    )
+
     queue_name: str
     queue_length: int
     newest_msg_age_sec: int
@@ -1,13 +1,45 @@
+from collections import deque
 from dataclasses import dataclass, field
 from typing import Optional, List, Union
-from psycopg.types.json import Jsonb
+from psycopg.adapt import AdaptersMap
+from psycopg.types.json import Jsonb, set_json_loads
 from psycopg_pool import ConnectionPool
+from orjson import dumps, loads, OPT_NON_STR_KEYS
+import psycopg
+import json
+import re
 import os
 from tembo_pgmq_python.messages import Message, QueueMetrics
 from tembo_pgmq_python.decorators import transaction
 import logging
 import datetime
 
+# (host, port, database) targets where the pgmq extension is known to be installed, so that
+# further clients for the same database skip the check during construction.
+_initialized_databases = set()
+
+# A run of 19+ digits may be an integer wider than 64 bits, which orjson would decode as a float.
+_LONG_DIGITS = re.compile(rb"\d{19}")
+
+
+def _dumps(obj) -> Union[bytes, str]:
+    # orjson rejects some payloads the stdlib accepts, such as integers wider than 64 bits,
+    # and writes NaN and infinities as null; re-encode those so non-finite floats are still rejected.
+    try:
+        data = dumps(obj, option=OPT_NON_STR_KEYS)
+    except TypeError:
+        return json.dumps(obj, allow_nan=False)
+    if b"null" in data:
+        return json.dumps(obj, allow_nan=False)
+    return data
+
+
+def _loads(data: bytes):
+    # Decode with orjson, falling back to the stdlib where it would lose integer precision.
+    if _LONG_DIGITS.search(data):
+        return json.loads(data)
+    return loads(data)
+
 
 @dataclass
 class PGMQueue:
@@ -24,8 +56,11 @@ class PGMQueue:
     kwargs: dict = field(default_factory=dict)
     verbose: bool = False
     log_filename: Optional[str] = None
+    autocommit: bool = True
+    prefetch_size: int = 1
     pool: ConnectionPool = field(init=False)
     logger: logging.Logger = field(init=False)
+    _prefetched: dict = field(init=False, repr=False, default_factory=dict)
 
     def __post_init__(self) -> None:
         conninfo = f"""
@@ -35,7 +70,16 @@ class PGMQueue:
         user={self.username}
         password={self.password}
         """
-        self.pool = ConnectionPool(conninfo, open=True, **self.kwargs)
+        pool_kwargs = {"min_size": 1, **self.kwargs}
+        # pool_size must not undercut a min_size passed through kwargs, which used to size the pool on its own.
+        pool_kwargs.setdefault("max_size", max(self.pool_size, pool_kwargs["min_size"]))
+        # Copied from the global adapters when the client is created, so adapters registered later are not seen.
+        adapters = AdaptersMap(psycopg.adapters)
+        set_json_loads(_loads, adapters)
+        # With autocommit, single pgmq calls made without an explicit transaction cost one round-trip;
+        # the transaction decorator still opens BEGIN/COMMIT blocks.
+        pool_kwargs["kwargs"] = {"autocommit": self.autocommit, "context": adapters, **pool_kwargs.get("kwargs", {})}
+        self.pool = ConnectionPool(conninfo, open=True, **pool_kwargs)
         self._initialize_logging()
         self._initialize_extensions()
 
@@ -53,23 +97,50 @@ class PGMQueue:
             self.logger.setLevel(logging.WARNING)
 
     def _initialize_extensions(self, conn=None) -> None:
+        database = (self.host, self.port, self.database)
+        if database in _initialized_databases:
+            return
         self._execute_query("create extension if not exists pgmq cascade;", conn=conn)
+        _initialized_databases.add(database)
 
     def _execute_query(self, query: str, params: Optional[Union[List, tuple]] = None, conn=None) -> None:
-        self.logger.debug(f"Executing query: {query} with params: {params} using conn: {conn}")
+        self.logger.debug("Executing query: %s with params: %s using conn: %s", query, params, conn)
         if conn:
             conn.execute(query, params)
         else:
             with self.pool.connection() as conn:
                 conn.execute(query, params)
 
-    def _execute_query_with_result(self, query: str, params: Optional[Union[List, tuple]] = None, conn=None):
-        self.logger.debug(f"Executing query with result: {query} with params: {params} using conn: {conn}")
+    def _execute_query_with_result(
+        self,
+        query: str,
+        params: Optional[Union[List, tuple]] = None,
+        conn=None,
+        prepare: Optional[bool] = None,
+    ):
+        # prepare=True makes psycopg prepare the statement on its first execution on a connection
+        # rather than after prepare_threshold runs; prepare_threshold=None still disables it.
+        self.logger.debug("Executing query with result: %s with params: %s using conn: %s", query, params, conn)
         if conn:
-            return conn.execute(query, params).fetchall()
+            return conn.execute(query, params, prepare=prepare).fetchall()
         else:
             with self.pool.connection() as conn:
-                return conn.execute(query, params).fetchall()
+                return conn.execute(query, params, prepare=prepare).fetchall()
+
+    def _execute_query_with_one_result(
+        self,
+        query: str,
+        params: Optional[Union[List, tuple]] = None,
+        conn=None,
+        prepare: Optional[bool] = None,
+    ):
+        # Single-row helpers fetch one tuple directly instead of building a list of rows.
+        self.logger.debug("Executing query with one result: %s with params: %s using conn: %s", query, params, conn)
+        if conn:
+            return conn.execute(query, params, prepare=prepare).fetchone()
+        else:
+            with self.pool.connection() as conn:
+                return conn.execute(query, params, prepare=prepare).fetchone()
 
     @transaction
     def create_partitioned_queue(
@@ -87,7 +158,7 @@ class PGMQueue:
     @transaction
     def create_queue(self, queue: str, unlogged: bool = False, conn=None) -> None:
         """Create a new queue."""
-        self.logger.debug(f"create_queue called with conn: {conn}")
+        self.logger.debug("create_queue called with conn: %s", conn)
         query = "select pgmq.create_unlogged(%s);" if unlogged else "select pgmq.create(%s);"
         self._execute_query(query, [queue], conn=conn)
 
@@ -99,36 +170,39 @@ class PGMQueue:
     @transaction
     def drop_queue(self, queue: str, partitioned: bool = False, conn=None) -> bool:
         """Drop a queue."""
-        self.logger.debug(f"drop_queue called with conn: {conn}")
+        self.logger.debug("drop_queue called with conn: %s", conn)
         query = "select pgmq.drop_queue(%s, %s);"
-        result = self._execute_query_with_result(query, [queue, partitioned], conn=conn)
-        return result[0][0]
+        result = self._execute_query_with_one_result(query, [queue, partitioned], conn=conn)
+        return result[0]
 
-    @transaction
     def list_queues(self, conn=None) -> List[str]:
         """List all queues."""
-        self.logger.debug(f"list_queues called with conn: {conn}")
+        self.logger.debug("list_queues called with conn: %s", conn)
         query = "select queue_name from pgmq.list_queues();"
         rows = self._execute_query_with_result(query, conn=conn)
         return [row[0] for row in rows]
 
-    @transaction
     def send(self, queue: str, message: dict, delay: int = 0, tz: datetime = None, conn=None) -> int:
         """Send a message to a queue."""
-        self.logger.debug(f"send called with conn: {conn}")
+        self.logger.debug("send called with conn: %s", conn)
         result = None
         if delay:
             query = "select * from pgmq.send(%s::text, %s::jsonb, %s::integer);"
-            result = self._execute_query_with_result(query, [queue, Jsonb(message), delay], conn=conn)
+            result = self._execute_query_with_one_result(
+                query, [queue, Jsonb(message, _dumps), delay], conn=conn, prepare=True
+            )
         elif tz:
             query = "select * from pgmq.send(%s::text, %s::jsonb, %s::timestamptz);"
-            result = self._execute_query_with_result(query, [queue, Jsonb(message), tz], conn=conn)
+            result = self._execute_query_with_one_result(
+                query, [queue, Jsonb(message, _dumps), tz], conn=conn, prepare=True
+            )
         else:
             query = "select * from pgmq.send(%s::text, %s::jsonb);"
-            result = self._execute_query_with_result(query, [queue, Jsonb(message)], conn=conn)
-        return result[0][0]
+            result = self._execute_query_with_one_result(
+                query, [queue, Jsonb(message, _dumps)], conn=conn, prepare=True
+            )
+        return result[0]
 
-    @transaction
     def send_batch(
         self,
         queue: str,
@@ -138,40 +212,36 @@ class PGMQueue:
         conn=None,
     ) -> List[int]:
         """Send a batch of messages to a queue."""
-        self.logger.debug(f"send_batch called with conn: {conn}")
+        self.logger.debug("send_batch called with conn: %s", conn)
         result = None
         if delay:
             query = "select * from pgmq.send_batch(%s::text, %s::jsonb[], %s::integer);"
-            params = [queue, [Jsonb(message) for message in messages], delay]
-            result = self._execute_query_with_result(query, params, conn=conn)
+            params = [queue, [Jsonb(message, _dumps) for message in messages], delay]
+            result = self._execute_query_with_result(query, params, conn=conn, prepare=True)
         elif tz:
             query = "select * from pgmq.send_batch(%s::text, %s::jsonb[], %s::timestamptz);"
-            params = [queue, [Jsonb(message) for message in messages], tz]
-            result = self._execute_query_with_result(query, params, conn=conn)
+            params = [queue, [Jsonb(message, _dumps) for message in messages], tz]
+            result = self._execute_query_with_result(query, params, conn=conn, prepare=True)
         else:
             query = "select * from pgmq.send_batch(%s::text, %s::jsonb[]);"
-            params = [queue, [Jsonb(message) for message in messages]]
-            result = self._execute_query_with_result(query, params, conn=conn)
+            params = [queue, [Jsonb(message, _dumps) for message in messages]]
+            result = self._execute_query_with_result(query, params, conn=conn, prepare=True)
         return [message[0] for message in result]
 
-    @transaction
     def read(self, queue: str, vt: Optional[int] = None, conn=None) -> Optional[Message]:
         """Read a message from a queue."""
-        self.logger.debug(f"read called with conn: {conn}")
+        self.logger.debug("read called with conn: %s", conn)
         query = "select * from pgmq.read(%s::text, %s::integer, %s::integer);"
-        rows = self._execute_query_with_result(query, [queue, vt or self.vt, 1], conn=conn)
-        messages = [Message(msg_id=x[0], read_ct=x[1], enqueued_at=x[2], vt=x[3], message=x[4]) for x in rows]
-        return messages[0] if messages else None
+        row = self._execute_query_with_one_result(query, [queue, vt or self.vt, 1], conn=conn, prepare=True)
+        return Message(row[0], row[1], row[2], row[3], row[4]) if row else None
 
-    @transaction
     def read_batch(self, queue: str, vt: Optional[int] = None, batch_size=1, conn=None) -> Optional[List[Message]]:
         """Read a batch of messages from a queue."""
-        self.logger.debug(f"read_batch called with conn: {conn}")
+        self.logger.debug("read_batch called with conn: %s", conn)
         query = "select * from pgmq.read(%s::text, %s::integer, %s::integer);"
-        rows = self._execute_query_with_result(query, [queue, vt or self.vt, batch_size], conn=conn)
-        return [Message(msg_id=x[0], read_ct=x[1], enqueued_at=x[2], vt=x[3], message=x[4]) for x in rows]
+        rows = self._execute_query_with_result(query, [queue, vt or self.vt, batch_size], conn=conn, prepare=True)
+        return [Message(x[0], x[1], x[2], x[3], x[4]) for x in rows]
 
-    @transaction
     def read_with_poll(
         self,
         queue: str,
@@ -182,111 +252,120 @@ class PGMQueue:
         conn=None,
     ) -> Optional[List[Message]]:
         """Read messages from a queue with polling."""
-        self.logger.debug(f"read_with_poll called with conn: {conn}")
+        self.logger.debug("read_with_poll called with conn: %s", conn)
         query = "select * from pgmq.read_with_poll(%s::text, %s::integer, %s::integer, %s::integer, %s::integer);"
         params = [queue, vt or self.vt, qty, max_poll_seconds, poll_interval_ms]
         rows = self._execute_query_with_result(query, params, conn=conn)
-        return [Message(msg_id=x[0], read_ct=x[1], enqueued_at=x[2], vt=x[3], message=x[4]) for x in rows]
+        return [Message(x[0], x[1], x[2], x[3], x[4]) for x in rows]
 
-    @transaction
-    def pop(self, queue: str, conn=None) -> Message:
+    def read_with_backoff(self, queue: str, qty: int = 1, base: int = 2, cap: int = 32, conn=None) -> List[Message]:
+        """Read messages from a queue, hiding each for min(base ** read_ct, cap) seconds."""
+        self.logger.debug("read_with_backoff called with conn: %s", conn)
+        # The exponent is capped at 31: any integer base >= 2 already reaches every integer cap by then,
+        # and power() would overflow float8 for large read_ct, failing the read on every retry.
+        query = """
+            select s.* from pgmq.read(%s::text, %s::integer, %s::integer) r,
+            lateral pgmq.set_vt(
+                %s::text, r.msg_id, least(power(%s::integer, least(r.read_ct, 31)), %s::integer)::integer
+            ) s
+            order by s.msg_id;
+        """
+        params = [queue, cap, qty, queue, base, cap]
+        rows = self._execute_query_with_result(query, params, conn=conn, prepare=True)
+        return [Message(x[0], x[1], x[2], x[3], x[4]) for x in rows]
+
+    def pop(self, queue: str, conn=None) -> Optional[Message]:
         """Pop a message from a queue."""
-        self.logger.debug(f"pop called with conn: {conn}")
+        self.logger.debug("pop called with conn: %s", conn)
+        if self.prefetch_size > 1 and conn is None:
+            return self._pop_prefetched(queue)
         query = "select * from pgmq.pop(%s);"
-        rows = self._execute_query_with_result(query, [queue], conn=conn)
-        messages = [Message(msg_id=x[0], read_ct=x[1], enqueued_at=x[2], vt=x[3], message=x[4]) for x in rows]
-        return messages[0]
+        row = self._execute_query_with_one_result(query, [queue], conn=conn, prepare=True)
+        return Message(row[0], row[1], row[2], row[3], row[4]) if row else None
+
+    def _pop_prefetched(self, queue: str) -> Optional[Message]:
+        # Messages are deleted from the queue when they are prefetched, so serving them
+        # from the local buffer keeps pop's at-most-once delivery.
+        buffer = self._prefetched.setdefault(queue, deque())
+        if not buffer:
+            buffer.extend(self.pop_batch(queue, self.prefetch_size))
+        try:
+            return buffer.popleft()
+        except IndexError:
+            return None
+
+    def pop_batch(self, queue: str, qty: int = 1, conn=None) -> List[Message]:
+        """Pop up to qty messages from a queue in a single round-trip."""
+        self.logger.debug("pop_batch called with conn: %s", conn)
+        # pgmq.read increments read_ct and sets vt to now; undo the former so read_ct matches what pop reports.
+        query = """
+        with r as (select * from pgmq.read(%s::text, 0, %s::integer))
+        select r.msg_id, r.read_ct - 1, r.enqueued_at, r.vt, r.message from r
+        where r.msg_id in (select pgmq.delete(%s::text, array(select msg_id from r)))
+        order by r.msg_id;
+        """
+        rows = self._execute_query_with_result(query, [queue, qty, queue], conn=conn, prepare=True)
+        return [Message(x[0], x[1], x[2], x[3], x[4]) for x in rows]
 
-    @transaction
     def delete(self, queue: str, msg_id: int, conn=None) -> bool:
         """Delete a message from a queue."""
-        self.logger.debug(f"delete called with conn: {conn}")
-        query = "select pgmq.delete(%s, %s);"
-        result = self._execute_query_with_result(query, [queue, msg_id], conn=conn)
-        return result[0][0]
+        self.logger.debug("delete called with conn: %s", conn)
+        query = "select pgmq.delete(%s::text, %s::bigint);"
+        result = self._execute_query_with_one_result(query, [queue, msg_id], conn=conn, prepare=True)
+        return result[0]
 
-    @transaction
     def delete_batch(self, queue: str, msg_ids: List[int], conn=None) -> List[int]:
         """Delete multiple messages from a queue."""
-        self.logger.debug(f"delete_batch called with conn: {conn}")
-        query = "select * from pgmq.delete(%s, %s);"
+        self.logger.debug("delete_batch called with conn: %s", conn)
+        query = "select * from pgmq.delete(%s::text, %s::bigint[]);"
         result = self._execute_query_with_result(query, [queue, msg_ids], conn=conn)
         return [x[0] for x in result]
 
-    @transaction
     def archive(self, queue: str, msg_id: int, conn=None) -> bool:
         """Archive a message from a queue."""
-        self.logger.debug(f"archive called with conn: {conn}")
-        query = "select pgmq.archive(%s, %s);"
-        result = self._execute_query_with_result(query, [queue, msg_id], conn=conn)
-        return result[0][0]
+        self.logger.debug("archive called with conn: %s", conn)
+        query = "select pgmq.archive(%s::text, %s::bigint);"
+        result = self._execute_query_with_one_result(query, [queue, msg_id], conn=conn, prepare=True)
+        return result[0]
 
-    @transaction
     def archive_batch(self, queue: str, msg_ids: List[int], conn=None) -> List[int]:
         """Archive multiple messages from a queue."""
-        self.logger.debug(f"archive_batch called with conn: {conn}")
-        query = "select * from pgmq.archive(%s, %s);"
+        self.logger.debug("archive_batch called with conn: %s", conn)
+        query = "select * from pgmq.archive(%s::text, %s::bigint[]);"
         result = self._execute_query_with_result(query, [queue, msg_ids], conn=conn)
         return [x[0] for x in result]
 
-    @transaction
     def purge(self, queue: str, conn=None) -> int:
         """Purge a queue."""
-        self.logger.debug(f"purge called with conn: {conn}")
+        self.logger.debug("purge called with conn: %s", conn)
         query = "select pgmq.purge_queue(%s);"
-        result = self._execute_query_with_result(query, [queue], conn=conn)
-        return result[0][0]
+        result = self._execute_query_with_one_result(query, [queue], conn=conn)
+        return result[0]
 
-    @transaction
     def metrics(self, queue: str, conn=None) -> QueueMetrics:
         """Get metrics for a specific queue."""
-        self.logger.debug(f"metrics called with conn: {conn}")
-        query = "SELECT * FROM pgmq.metrics(%s);"
-        result = self._execute_query_with_result(query, [queue], conn=conn)[0]
-        return QueueMetrics(
-            queue_name=result[0],
-            queue_length=result[1],
-            newest_msg_age_sec=result[2],
-            oldest_msg_age_sec=result[3],
-            total_messages=result[4],
-            scrape_time=result[5],
-        )
+        self.logger.debug("metrics called with conn: %s", conn)
+        query = "SELECT * FROM pgmq.metrics(%s::text);"
+        result = self._execute_query_with_one_result(query, [queue], conn=conn, prepare=True)
+        return QueueMetrics(result[0], result[1], result[2], result[3], result[4], result[5])
 
-    @transaction
     def metrics_all(self, conn=None) -> List[QueueMetrics]:
         """Get metrics for all queues."""
-        self.logger.debug(f"metrics_all called with conn: {conn}")
+        self.logger.debug("metrics_all called with conn: %s", conn)
         query = "SELECT * FROM pgmq.metrics_all();"
-        results = self._execute_query_with_result(query, conn=conn)
-        return [
-            QueueMetrics(
-                queue_name=row[0],
-                queue_length=row[1],
-                newest_msg_age_sec=row[2],
-                oldest_msg_age_sec=row[3],
-                total_messages=row[4],
-                scrape_time=row[5],
-            )
-            for row in results
-        ]
+        results = self._execute_query_with_result(query, conn=conn, prepare=True)
+        return [QueueMetrics(row[0], row[1], row[2], row[3], row[4], row[5]) for row in results]
 
-    @transaction
     def set_vt(self, queue: str, msg_id: int, vt: int, conn=None) -> Message:
         """Set the visibility timeout for a specific message."""
-        self.logger.debug(f"set_vt called with conn: {conn}")
+        self.logger.debug("set_vt called with conn: %s", conn)
         query = "select * from pgmq.set_vt(%s, %s, %s);"
-        result = self._execute_query_with_result(query, [queue, msg_id, vt], conn=conn)[0]
-        return Message(
-            msg_id=result[0],
-            read_ct=result[1],
-            enqueued_at=result[2],
-            vt=result[3],
-            message=result[4],
-        )
+        result = self._execute_query_with_one_result(query, [queue, msg_id, vt], conn=conn, prepare=True)
+        return Message(result[0], result[1], result[2], result[3], result[4])
 
     @transaction
     def detach_archive(self, queue: str, conn=None) -> None:
         """Detach an archive from a queue."""
-        self.logger.debug(f"detach_archive called with conn: {conn}")
+        self.logger.debug("detach_archive called with conn: %s", conn)
         query = "select pgmq.detach_archive(%s);"
         self._execute_query(query, [queue], conn=conn)
@@ -37,6 +37,23 @@ class BaseTestPGMQueue(unittest.IsolatedAsyncioTestCase):
     async def asyncTearDown(self):
         await self.queue.pool.close()
 
+    async def test_pool_min_size_in_kwargs(self):
+        """Test that a min_size above pool_size passed through kwargs raises the pool's max_size."""
+        queue = PGMQueue(
+            host="localhost",
+            port="5432",
+            username="postgres",
+            password="postgres",
+            database="postgres",
+            kwargs={"min_size": 20},
+        )
+        await queue.init()
+        try:
+            self.assertEqual(queue.pool.get_min_size(), 20)
+            self.assertEqual(queue.pool.get_max_size(), 20)
+        finally:
+            await queue.pool.close()
+
     async def test_create_queue(self):
         """Test creating a queue."""
         await self.queue.create_queue("test_queue_2")
@@ -101,6 +118,25 @@ class BaseTestPGMQueue(unittest.IsolatedAsyncioTestCase):
         msg_ids = await self.queue.send_batch(self.test_queue, messages)
         self.assertEqual(len(msg_ids), 2)
 
+    async def test_send_batch_with_tz(self):
+        """Test sending a batch of messages with a timestamp delay."""
+        timestamp = datetime.now(timezone.utc) + timedelta(seconds=5)
+        messages = [self.test_message, self.test_message]
+        msg_ids = await self.queue.send_batch(self.test_queue, messages, tz=timestamp)
+        self.assertEqual(len(msg_ids), 2)
+        message = await self.queue.read(self.test_queue, vt=20)
+        self.assertIsNone(message, "Messages should not be visible yet")
+
+    async def test_read_many(self):
+        """Test reading from several queues concurrently."""
+        await self.queue.create_queue("test_queue_2")
+        await self.queue.purge("test_queue_2")
+        msg_id = await self.queue.send(self.test_queue, self.test_message)
+        messages = await self.queue.read_many([self.test_queue, "test_queue_2"], vt=20)
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(messages[0].msg_id, msg_id, "Read the wrong message")
+        self.assertIsNone(messages[1], "No message expected in empty queue")
+
     async def test_read_batch(self):
         """Test reading a batch of messages from the queue."""
         messages = [self.test_message, self.test_message]
@@ -114,6 +150,35 @@ class BaseTestPGMQueue(unittest.IsolatedAsyncioTestCase):
         no_message = await self.queue.read(self.test_queue, vt=20)
         self.assertIsNone(no_message, "Messages should be invisible after read_batch")
 
+    async def test_read_with_backoff(self):
+        """Test reading messages with an exponential visibility timeout."""
+        msg_id = await self.queue.send(self.test_queue, self.test_message)
+        messages = await self.queue.read_with_backoff(self.test_queue, qty=1, base=2, cap=32)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0].msg_id, msg_id, "Read the wrong message")
+        self.assertEqual(messages[0].read_ct, 1)
+        self.assertLessEqual(
+            messages[0].vt, datetime.now(timezone.utc) + timedelta(seconds=3)
+        )
+        message = await self.queue.read(self.test_queue)
+        self.assertIsNone(message, "Message should be invisible after read_with_backoff")
+
+    async def test_read_with_backoff_high_read_ct(self):
+        """Test that read_with_backoff caps the vt for messages read many times."""
+        msg_id = await self.queue.send(self.test_queue, self.test_message)
+        async with self.queue.pool.acquire() as conn:
+            await conn.execute(f"update pgmq.q_{self.test_queue} set read_ct = 2000;")
+        messages = await self.queue.read_with_backoff(self.test_queue, qty=1, base=2, cap=32)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0].msg_id, msg_id, "Read the wrong message")
+        self.assertEqual(messages[0].read_ct, 2001)
+        self.assertGreaterEqual(
+            messages[0].vt, datetime.now(timezone.utc) + timedelta(seconds=30)
+        )
+        self.assertLessEqual(
+            messages[0].vt, datetime.now(timezone.utc) + timedelta(seconds=33)
+        )
+
     async def test_pop_message(self):
         """Test popping a message from the queue."""
         msg_id = await self.queue.send(self.test_queue, self.test_message)
@@ -121,6 +186,41 @@ class BaseTestPGMQueue(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(message.message, self.test_message)
         self.assertEqual(message.msg_id, msg_id, "Popped the wrong message")
 
+    async def test_pop_batch(self):
+        """Test popping a batch of messages from the queue."""
+        msg_ids = await self.queue.send_batch(
+            self.test_queue, [self.test_message, self.test_message, self.test_message]
+        )
+        messages = await self.queue.pop_batch(self.test_queue, qty=2)
+        self.assertEqual([message.msg_id for message in messages], msg_ids[:2])
+        for message in messages:
+            self.assertEqual(message.message, self.test_message)
+            self.assertEqual(message.read_ct, 0, "read_ct should match pop")
+        remaining = await self.queue.read_batch(self.test_queue, vt=20, batch_size=3)
+        self.assertEqual([message.msg_id for message in remaining], msg_ids[2:])
+
+    async def test_pop_with_prefetch(self):
+        """Test popping messages through the prefetch buffer."""
+        queue = PGMQueue(
+            host="localhost",
+            port="5432",
+            username="postgres",
+            password="postgres",
+            database="postgres",
+            prefetch_size=2,
+        )
+        await queue.init()
+        try:
+            msg_ids = await queue.send_batch(
+                self.test_queue, [self.test_message, self.test_message, self.test_message]
+            )
+            popped = [await queue.pop(self.test_queue) for _ in range(3)]
+            self.assertEqual([message.msg_id for message in popped], msg_ids)
+            self.assertEqual([message.read_ct for message in popped], [0, 0, 0], "read_ct should match pop")
+            self.assertIsNone(await queue.pop(self.test_queue), "No message expected in queue")
+        finally:
+            await queue.pool.close()
+
     async def test_purge_queue(self):
         """Test purging the queue."""
         messages = [self.test_message, self.test_message]
@@ -35,6 +35,65 @@ class BaseTestPGMQueue(unittest.TestCase):
         """Purge the queue before each test to ensure a clean state."""
         self.queue.purge(self.test_queue)
 
+    def test_pool_min_size_in_kwargs(self):
+        """Test that a min_size above pool_size passed through kwargs raises the pool's max_size."""
+        queue = PGMQueue(
+            host="localhost",
+            port="5432",
+            username="postgres",
+            password="postgres",
+            database="postgres",
+            kwargs={"min_size": 20},
+        )
+        try:
+            self.assertEqual(queue.pool.min_size, 20)
+            self.assertEqual(queue.pool.max_size, 20)
+        finally:
+            queue.pool.close()
+
+    def test_autocommit_disabled(self):
+        """Test that send, read and pop are committed when pool connections do not autocommit."""
+        queue = PGMQueue(
+            host="localhost",
+            port="5432",
+            username="postgres",
+            password="postgres",
+            database="postgres",
+            autocommit=False,
+        )
+        try:
+            msg_id = queue.send(self.test_queue, self.test_message)
+            message = queue.read(self.test_queue, vt=20)
+            self.assertEqual(message.msg_id, msg_id, "Read the wrong message")
+            self.assertIsNone(self.queue.read(self.test_queue), "Read should have committed the new vt")
+            popped_id = queue.send(self.test_queue, self.test_message)
+            popped = queue.pop(self.test_queue)
+            self.assertEqual(popped.msg_id, popped_id, "Popped the wrong message")
+            metrics = self.queue.metrics(self.test_queue)
+            self.assertEqual(metrics.queue_length, 1, "Pop should have committed the delete")
+        finally:
+            queue.pool.close()
+
+    def test_reuse_connection(self):
+        """Test that calls made on a pool connection are committed when the block exits."""
+        for autocommit in (True, False):
+            queue = PGMQueue(
+                host="localhost",
+                port="5432",
+                username="postgres",
+                password="postgres",
+                database="postgres",
+                autocommit=autocommit,
+            )
+            try:
+                self.queue.purge(self.test_queue)
+                with queue.pool.connection() as conn:
+                    msg_ids = [queue.send(self.test_queue, self.test_message, conn=conn) for _ in range(2)]
+                messages = self.queue.read_batch(self.test_queue, vt=20, batch_size=2)
+                self.assertEqual([message.msg_id for message in messages], msg_ids)
+            finally:
+                queue.pool.close()
+
     def test_create_queue(self):
         """Test creating a queue."""
         self.queue.create_queue("test_queue_2")
@@ -48,6 +107,27 @@ class BaseTestPGMQueue(unittest.TestCase):
         self.assertEqual(message.message, self.test_message)
         self.assertEqual(message.msg_id, msg_id, "Read the wrong message")
 
+    def test_send_message_with_non_str_keys(self):
+        """Test sending a message whose keys are not strings."""
+        msg_id = self.queue.send(self.test_queue, {1: "x"})
+        message: Message = self.queue.read(self.test_queue, vt=20)
+        self.assertEqual(message.message, {"1": "x"})
+        self.assertEqual(message.msg_id, msg_id, "Read the wrong message")
+
+    def test_send_message_with_nan(self):
+        """Test that non-finite floats are rejected rather than stored as null."""
+        with self.assertRaises(ValueError):
+            self.queue.send(self.test_queue, {"a": float("nan")})
+
+    def test_send_and_read_message_with_large_int(self):
+        """Test that integers wider than 64 bits are read back exactly."""
+        large = {"n": 123456789012345678901234567890}
+        msg_id = self.queue.send(self.test_queue, large)
+        message: Message = self.queue.read(self.test_queue, vt=20)
+        self.assertEqual(message.message, large)
+        self.assertIsInstance(message.message["n"], int)
+        self.assertEqual(message.msg_id, msg_id, "Read the wrong message")
+
     def test_send_and_read_message_without_vt(self):
         """Test sending and reading a message from the queue without VT."""
         msg_id = self.queue.send(self.test_queue, self.test_message)
@@ -110,6 +190,28 @@ class BaseTestPGMQueue(unittest.TestCase):
         no_message = self.queue.read(self.test_queue, vt=20)
         self.assertIsNone(no_message, "Messages should be invisible after read_batch")
 
+    def test_read_with_backoff(self):
+        """Test reading messages with an exponential visibility timeout."""
+        msg_id = self.queue.send(self.test_queue, self.test_message)
+        messages = self.queue.read_with_backoff(self.test_queue, qty=1, base=2, cap=32)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0].msg_id, msg_id, "Read the wrong message")
+        self.assertEqual(messages[0].read_ct, 1)
+        self.assertLessEqual(messages[0].vt, datetime.now(timezone.utc) + timedelta(seconds=3))
+        self.assertIsNone(self.queue.read(self.test_queue), "Message should be invisible after read_with_backoff")
+
+    def test_read_with_backoff_high_read_ct(self):
+        """Test that read_with_backoff caps the vt for messages read many times."""
+        msg_id = self.queue.send(self.test_queue, self.test_message)
+        with self.queue.pool.connection() as conn:
+            conn.execute(f"update pgmq.q_{self.test_queue} set read_ct = 2000;")
+        messages = self.queue.read_with_backoff(self.test_queue, qty=1, base=2, cap=32)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0].msg_id, msg_id, "Read the wrong message")
+        self.assertEqual(messages[0].read_ct, 2001)
+        self.assertGreaterEqual(messages[0].vt, datetime.now(timezone.utc) + timedelta(seconds=30))
+        self.assertLessEqual(messages[0].vt, datetime.now(timezone.utc) + timedelta(seconds=33))
+
     def test_pop_message(self):
         """Test popping a message from the queue."""
         msg_id = self.queue.send(self.test_queue, self.test_message)
@@ -117,6 +219,41 @@ class BaseTestPGMQueue(unittest.TestCase):
         self.assertEqual(message.message, self.test_message)
         self.assertEqual(message.msg_id, msg_id, "Popped the wrong message")
 
+    def test_pop_empty_queue(self):
+        """Test popping from an empty queue returns None."""
+        message = self.queue.pop(self.test_queue)
+        self.assertIsNone(message, "No message expected in queue")
+
+    def test_pop_batch(self):
+        """Test popping a batch of messages from the queue."""
+        msg_ids = self.queue.send_batch(self.test_queue, [self.test_message, self.test_message, self.test_message])
+        messages = self.queue.pop_batch(self.test_queue, qty=2)
+        self.assertEqual([message.msg_id for message in messages], msg_ids[:2])
+        for message in messages:
+            self.assertEqual(message.message, self.test_message)
+            self.assertEqual(message.read_ct, 0, "read_ct should match pop")
+        remaining = self.queue.read_batch(self.test_queue, vt=20, batch_size=3)
+        self.assertEqual([message.msg_id for message in remaining], msg_ids[2:])
+
+    def test_pop_with_prefetch(self):
+        """Test popping messages through the prefetch buffer."""
+        queue = PGMQueue(
+            host="localhost",
+            port="5432",
+            username="postgres",
+            password="postgres",
+            database="postgres",
+            prefetch_size=2,
+        )
+        try:
+            msg_ids = queue.send_batch(self.test_queue, [self.test_message, self.test_message, self.test_message])
+            popped = [queue.pop(self.test_queue) for _ in range(3)]
+            self.assertEqual([message.msg_id for message in popped], msg_ids)
+            self.assertEqual([message.read_ct for message in popped], [0, 0, 0], "read_ct should match pop")
+            self.assertIsNone(queue.pop(self.test_queue), "No message expected in queue")
+        finally:
+            queue.pool.close()
+
     def test_purge_queue(self):
         """Test purging the queue."""
         messages = [self.test_message, self.test_message]